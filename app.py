@@ -4,6 +4,7 @@ from pathlib import Path
 from utils.auth import is_authenticated, logout_user
 from utils.file_manager import ensure_directories
 from utils.network_storage import auto_mount_network_storage
+from utils.media_index import start_watcher
 
 # Configure page
 st.set_page_config(
@@ -19,6 +20,9 @@ ensure_directories()
 # Auto-mount network storage
 auto_mount_network_storage()
 
+# Keep the media index warm (no-op without pyinotify)
+start_watcher()
+
 # Authentication check
 if not is_authenticated():
     st.switch_page("pages/4_Settings.py")
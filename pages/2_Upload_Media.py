@@ -3,7 +3,8 @@ import os
 from pathlib import Path
 from utils.auth import is_authenticated
 from utils.file_manager import clean_filename, move_file, get_file_info, validate_file_upload
-from utils.media_handler import organize_media_file, generate_thumbnail
+from utils.media_handler import organize_media_file, generate_thumbnails_bulk
+from utils.media_index import invalidate_index
 from utils.network_storage import get_network_storage_config, sync_media_to_network_storage
 
 # Check authentication
@@ -93,6 +94,7 @@ def upload_files(uploaded_files, organize_files, generate_thumbnails, sync_to_ne
     
     uploaded_count = 0
     total_files = len(uploaded_files)
+    uploaded_videos = []
     
     for i, uploaded_file in enumerate(uploaded_files):
         try:
@@ -129,18 +131,31 @@ def upload_files(uploaded_files, organize_files, generate_thumbnails, sync_to_ne
                 os.remove(upload_path)
                 continue
             
-            # Generate thumbnail for videos
+            # Queue videos for thumbnail generation
             if generate_thumbnails and is_video_file(filename):
-                try:
-                    generate_thumbnail(str(upload_path))
-                except Exception as e:
-                    st.warning(f"⚠️ Could not generate thumbnail for {filename}: {e}")
+                uploaded_videos.append(str(upload_path))
             
             uploaded_count += 1
             
         except Exception as e:
             st.error(f"❌ Error uploading {uploaded_file.name}: {str(e)}")
     
+    # Overwritten files keep their directory mtimes, so tell the index to rescan
+    if uploaded_count > 0:
+        invalidate_index()
+    
+    # Generate thumbnails for all uploaded videos in parallel
+    if uploaded_videos:
+        status_text.text(f"Generating thumbnails for {len(uploaded_videos)} videos...")
+        try:
+            # Overwritten videos need fresh thumbnails even if old ones exist
+            thumbnail_results = generate_thumbnails_bulk(uploaded_videos, force=overwrite_existing)
+            for video_path, generated in thumbnail_results.items():
+                if not generated:
+                    st.warning(f"⚠️ Could not generate thumbnail for {Path(video_path).name}")
+        except Exception as e:
+            st.warning(f"⚠️ Could not generate thumbnails: {e}")
+    
     # Sync to network storage if enabled
     if sync_to_network and uploaded_count > 0:
         status_text.text("Syncing to Raspberry Pi...")
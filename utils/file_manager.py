@@ -2,10 +2,43 @@ import os
 import shutil
 import hashlib
 import re
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 from datetime import datetime
+from itertools import groupby
 import mimetypes
 
+# Files smaller than this are copied with shutil; syscall setup dominates below it
+FAST_COPY_MIN_SIZE = 64 * 1024
+# Upper bound for a single copy_file_range/sendfile call
+FAST_COPY_CHUNK = 1 << 30
+
+# Filesystems where directory reads are high-latency and benefit from concurrency
+NETWORK_FS_TYPES = frozenset({'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', 'fuse.sshfs'})
+
+# Last parsed mount table, and an open mountinfo fd polled for changes to it
+_MOUNT_CACHE = {'poller': None, 'fd': None, 'entries': None}
+_MOUNT_LOCK = threading.Lock()
+
+# O_CLOEXEC and select.poll are POSIX-only; without /proc there is no mount table anyway
+_MOUNTINFO_FLAGS = os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0)
+
+SUPPORTED_EXTENSIONS = frozenset({
+    # Videos
+    '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v',
+    # Images
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg',
+    # Audio
+    '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a',
+    # Documents
+    '.pdf', '.txt', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
+    # Archives
+    '.zip', '.rar', '.7z', '.tar', '.gz'
+})
+
 def ensure_directories():
     """Ensure all required directories exist"""
     directories = [
@@ -28,7 +61,7 @@ def get_file_size(file_path):
     """Get file size in bytes"""
     try:
         return os.path.getsize(file_path)
-    except:
+    except OSError:
         return 0
 
 def get_file_date(file_path):
@@ -36,39 +69,158 @@ def get_file_date(file_path):
     try:
         timestamp = os.path.getmtime(file_path)
         return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
-    except:
+    except (OSError, OverflowError, ValueError):
         return "Unknown"
 
+def iter_files(directory):
+    """Yield DirEntry objects for all regular files under directory"""
+    pending = [directory]
+    
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+                    except OSError:
+                        # Entry vanished mid-scan
+                        continue
+        except OSError:
+            continue
+
+def _scan_directory(directory):
+    """List the regular files and subdirectories of one directory"""
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(entry)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+    return files, subdirs
+
+def iter_files_parallel(directory, max_workers=32):
+    """Yield DirEntry objects for all regular files, scanning directories concurrently"""
+    # os.scandir releases the GIL, so threads keep many directory reads in flight
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(_scan_directory, directory)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                pending.update(executor.submit(_scan_directory, subdir) for subdir in subdirs)
+                yield from files
+
+def _unescape_mount_field(field):
+    """Decode octal escapes (e.g. \\040 for space) used in mountinfo fields"""
+    return re.sub(r'\\([0-7]{3})', lambda match: chr(int(match.group(1), 8)), field)
+
+def _read_mounts():
+    """Parse /proc/self/mountinfo into a list of dicts"""
+    try:
+        fd = os.open('/proc/self/mountinfo', _MOUNTINFO_FLAGS)
+    except OSError:
+        return []
+    try:
+        # seq_file reads return at most a page or so at a time; loop to EOF
+        chunks = []
+        while True:
+            chunk = os.read(fd, 1 << 20)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except OSError:
+        return []
+    finally:
+        os.close(fd)
+    
+    mounts = []
+    for line in b''.join(chunks).split(b'\n'):
+        # <id> <parent> <dev> <root> <mount point> <options> [optional...] - <type> <source> <super options>
+        fields, _, tail = line.partition(b' - ')
+        fields = fields.split()
+        tail = tail.split()
+        if len(fields) < 6 or len(tail) < 3:
+            continue
+        mounts.append({
+            'device': _unescape_mount_field(os.fsdecode(tail[1])),
+            'mount_point': _unescape_mount_field(os.fsdecode(fields[4])),
+            'type': tail[0].decode(),
+            'options': f"{fields[5].decode()},{tail[2].decode()}"
+        })
+    return mounts
+
+def _mounts_changed():
+    """Check whether the mount table changed since the last call"""
+    if not hasattr(select, 'poll'):
+        # No way to watch for changes; get_mounts parses the table once
+        return False
+    poller = _MOUNT_CACHE['poller']
+    if poller is None:
+        try:
+            fd = os.open('/proc/self/mountinfo', _MOUNTINFO_FLAGS)
+        except OSError:
+            return True
+        poller = select.poll()
+        poller.register(fd, select.POLLPRI | select.POLLERR)
+        _MOUNT_CACHE['fd'], _MOUNT_CACHE['poller'] = fd, poller
+        return True
+    # procfs reports a constant size and mtime, so stat cannot detect changes;
+    # the kernel instead flags POLLPRI on open mountinfo fds after (un)mounts
+    return bool(poller.poll(0))
+
+def get_mounts():
+    """Get the mount table as a list of dicts, reparsed only after it changes
+    
+    The list is shared between callers and must not be modified.
+    """
+    with _MOUNT_LOCK:
+        if _mounts_changed() or _MOUNT_CACHE['entries'] is None:
+            _MOUNT_CACHE['entries'] = _read_mounts()
+        return _MOUNT_CACHE['entries']
+
+def get_filesystem_type(path):
+    """Get the filesystem type path lives on, or None if unknown"""
+    path = os.path.realpath(path)
+    best_mount, best_type = '', None
+    for mount in get_mounts():
+        mount_point = mount['mount_point']
+        if path == mount_point or path.startswith(mount_point.rstrip('/') + '/'):
+            if len(mount_point) >= len(best_mount):
+                best_mount, best_type = mount_point, mount['type']
+    return best_type
+
+def is_network_path(path):
+    """Check if path is on a network filesystem"""
+    return get_filesystem_type(path) in NETWORK_FS_TYPES
+
+def walk_sizes(directory):
+    """Sum sizes of all regular files under directory"""
+    total_size = 0
+    for entry in iter_files(directory):
+        try:
+            total_size += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return total_size
+
 def get_directory_size(directory):
     """Get total size of directory in bytes"""
-    try:
-        total_size = 0
-        for dirpath, dirnames, filenames in os.walk(directory):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                if os.path.exists(filepath):
-                    total_size += os.path.getsize(filepath)
-        return total_size
-    except:
-        return 0
+    return walk_sizes(directory)
 
 def is_supported_format(file_path):
     """Check if file format is supported"""
-    supported_extensions = {
-        # Videos
-        '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v',
-        # Images
-        '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg',
-        # Audio
-        '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a',
-        # Documents
-        '.pdf', '.txt', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx',
-        # Archives
-        '.zip', '.rar', '.7z', '.tar', '.gz'
-    }
-    
-    file_ext = Path(file_path).suffix.lower()
-    return file_ext in supported_extensions
+    return os.path.splitext(file_path)[1].lower() in SUPPORTED_EXTENSIONS
 
 def clean_filename(filename):
     """Clean filename for safe storage"""
@@ -85,19 +237,77 @@ def move_file(source, destination):
     """Move file from source to destination"""
     try:
         # Ensure destination directory exists
-        Path(destination).parent.mkdir(parents=True, exist_ok=True)
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
         shutil.move(source, destination)
         return True
     except Exception as e:
         print(f"Error moving file: {e}")
         return False
 
+def _kernel_copy(source, destination):
+    """Copy file contents in-kernel, returning False if no fast path applies"""
+    src_stat = os.stat(source)
+    size = src_stat.st_size
+    if size < FAST_COPY_MIN_SIZE or not hasattr(os, 'sendfile'):
+        return False
+    
+    # Opening the destination truncates it, so never let it be the source itself
+    try:
+        if os.path.samestat(src_stat, os.stat(destination)):
+            raise shutil.SameFileError(f"{source!r} and {destination!r} are the same file")
+    except FileNotFoundError:
+        pass
+    
+    src_fd = os.open(source, os.O_RDONLY)
+    try:
+        dst_fd = os.open(destination, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            dst_dev = os.fstat(dst_fd).st_dev
+            offset = 0
+            
+            # Same filesystem: copy_file_range can reflink on btrfs/XFS
+            if hasattr(os, 'copy_file_range') and src_stat.st_dev == dst_dev:
+                try:
+                    while offset < size:
+                        copied = os.copy_file_range(src_fd, dst_fd, min(size - offset, FAST_COPY_CHUNK))
+                        if copied == 0:
+                            break
+                        offset += copied
+                except OSError:
+                    # Unsupported by the filesystem; sendfile picks up from the current offset
+                    pass
+            
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, min(size - offset, FAST_COPY_CHUNK))
+                if sent == 0:
+                    break
+                offset += sent
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    
+    return offset == size
+
+def fast_copy(source, destination):
+    """Copy file with data and metadata, using in-kernel copies where available"""
+    try:
+        copied = _kernel_copy(source, destination)
+    except OSError:
+        copied = False
+    
+    if not copied:
+        shutil.copy2(source, destination)
+        return
+    
+    shutil.copystat(source, destination)
+
 def copy_file(source, destination):
     """Copy file from source to destination"""
     try:
         # Ensure destination directory exists
-        Path(destination).parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(source, destination)
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        fast_copy(source, destination)
         return True
     except Exception as e:
         print(f"Error copying file: {e}")
@@ -106,9 +316,9 @@ def copy_file(source, destination):
 def delete_file(file_path):
     """Delete file"""
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            return True
+        os.remove(file_path)
+        return True
+    except FileNotFoundError:
         return False
     except Exception as e:
         print(f"Error deleting file: {e}")
@@ -117,7 +327,7 @@ def delete_file(file_path):
 def create_directory(directory_path):
     """Create directory"""
     try:
-        Path(directory_path).mkdir(parents=True, exist_ok=True)
+        os.makedirs(directory_path, exist_ok=True)
         return True
     except Exception as e:
         print(f"Error creating directory: {e}")
@@ -196,31 +406,38 @@ def get_available_space(path="."):
         print(f"Error getting available space: {e}")
         return 0
 
-def cleanup_temp_files():
-    """Clean up temporary files"""
+def _remove_files_older_than(directory, cutoff):
+    """Remove regular files in directory modified before cutoff (None removes all)"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if cutoff is None or entry.stat(follow_symlinks=False).st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                continue
+
+def cleanup_temp_files(max_age=None):
+    """Clean up temporary files, optionally only those older than max_age seconds"""
     try:
-        temp_dir = Path("temp")
-        if temp_dir.exists():
-            for file in temp_dir.iterdir():
-                if file.is_file():
-                    file.unlink()
+        if os.path.isdir("temp"):
+            cutoff = time.time() - max_age if max_age is not None else None
+            _remove_files_older_than("temp", cutoff)
         return True
     except Exception as e:
         print(f"Error cleaning temp files: {e}")
         return False
 
-def cleanup_thumbnails():
+def cleanup_thumbnails(max_age=30 * 24 * 60 * 60):
     """Clean up old thumbnails"""
     try:
-        thumb_dir = Path("media/thumbnails")
-        if thumb_dir.exists():
-            # Clean thumbnails older than 30 days
-            import time
-            current_time = time.time()
-            for file in thumb_dir.iterdir():
-                if file.is_file():
-                    if current_time - file.stat().st_mtime > 30 * 24 * 60 * 60:  # 30 days
-                        file.unlink()
+        if os.path.isdir("media/thumbnails"):
+            # Clean thumbnails older than 30 days by default
+            _remove_files_older_than("media/thumbnails", time.time() - max_age)
+            
+            from utils.media_handler import reset_thumbnail_cache
+            reset_thumbnail_cache()
         return True
     except Exception as e:
         print(f"Error cleaning thumbnails: {e}")
@@ -240,7 +457,7 @@ def backup_file(file_path, backup_dir="backups"):
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         backup_file_path = backup_path / f"{source_path.stem}_{timestamp}{source_path.suffix}"
         
-        shutil.copy2(source_path, backup_file_path)
+        fast_copy(source_path, backup_file_path)
         return True
     except Exception as e:
         print(f"Error backing up file: {e}")
@@ -292,25 +509,67 @@ def get_file_hash(file_path, algorithm='sha256'):
         print(f"Error getting file hash: {e}")
         return None
 
+def get_file_head_hash(file_path, length=4096, algorithm='sha256'):
+    """Get hash of the first bytes of a file"""
+    try:
+        with open(file_path, 'rb') as f:
+            return hashlib.new(algorithm, f.read(length)).hexdigest()
+    except OSError as e:
+        print(f"Error getting file head hash: {e}")
+        return None
+
+def _runs(records):
+    """Sort records and yield runs of two or more sharing all but the last field"""
+    records.sort()
+    for _, group in groupby(records, key=lambda record: record[:-1]):
+        run = list(group)
+        if len(run) > 1:
+            yield run
+
 def find_duplicate_files(directory):
     """Find duplicate files in directory"""
     try:
-        file_hashes = {}
+        records = []
+        for entry in iter_files(directory):
+            try:
+                records.append((entry.stat(follow_symlinks=False).st_size, entry.path))
+            except OSError:
+                continue
+        
         duplicates = []
+        head_records = []
         
-        for file_path in find_files(directory):
-            if file_path.is_file():
-                file_hash = get_file_hash(file_path)
+        # Only files sharing a size can be duplicates
+        for run in _runs(records):
+            size = run[0][0]
+            
+            # Empty files are trivially identical, no need to open them
+            if size == 0:
+                original = run[0][1]
+                for _, path in run[1:]:
+                    duplicates.append({'original': original, 'duplicate': path, 'empty': True})
+                continue
+            
+            for _, path in run:
+                head_hash = get_file_head_hash(path)
+                if head_hash:
+                    head_records.append((size, head_hash, path))
+        
+        # Narrow by the first 4 KiB before reading whole files
+        full_records = []
+        for run in _runs(head_records):
+            for size, head_hash, path in run:
+                # Small files were read in full by the head pass
+                file_hash = head_hash if size <= 4096 else get_file_hash(path)
                 if file_hash:
-                    if file_hash in file_hashes:
-                        duplicates.append({
-                            'original': file_hashes[file_hash],
-                            'duplicate': str(file_path)
-                        })
-                    else:
-                        file_hashes[file_hash] = str(file_path)
+                    full_records.append((size, head_hash, file_hash, path))
+        
+        for run in _runs(full_records):
+            original = run[0][-1]
+            for record in run[1:]:
+                duplicates.append({'original': original, 'duplicate': record[-1], 'empty': False})
         
         return duplicates
     except Exception as e:
         print(f"Error finding duplicates: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -1,126 +1,195 @@
 import os
 import json
+import asyncio
+import heapq
+import importlib.util
+import multiprocessing
+import subprocess
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
 import mimetypes
-from utils.file_manager import get_file_size, get_file_date, format_size, find_files
+import mmap
+import re
+import sqlite3
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
-def get_media_files(directory="media/uploads"):
-    """Get all media files from directory"""
+from utils.file_manager import format_size, is_network_path
+from utils.media_index import ensure_index, get_index_stats, search_index
+from utils.media_types import (
+    VIDEO_EXTENSIONS, IMAGE_EXTENSIONS, AUDIO_EXTENSIONS, DOCUMENT_EXTENSIONS,
+    EXT_TO_TYPE, MEDIA_EXTENSIONS, TYPE_TO_EXTENSIONS,
+    file_extension, get_media_type, iter_media_entries,
+)
+
+__all__ = [
+    'VIDEO_EXTENSIONS', 'IMAGE_EXTENSIONS', 'AUDIO_EXTENSIONS', 'DOCUMENT_EXTENSIONS',
+    'MEDIA_EXTENSIONS', 'THUMBNAIL_POSITION',
+    'file_extension', 'iter_media_entries', 'get_media_files', 'get_recent_media',
+    'scan_stats', 'get_media_stats', 'get_media_type', 'format_file_size', 'organize_media_file',
+    'generate_thumbnail', 'generate_thumbnails_bulk', 'reset_thumbnail_cache', 'get_media_info', 'delete_media_file',
+    'search_media', 'search_media_terms', 'get_media_by_type',
+    'create_media_playlist', 'get_playlists',
+]
+
+# Start thumbnail workers from a clean process rather than forking the threaded app server
+_WORKER_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+# Position of the thumbnail frame as a fraction of the video duration
+THUMBNAIL_POSITION = 0.5
+
+# Thumbnail directory to {file name: st_mtime_ns} for the thumbnails known to exist in it
+_THUMBNAIL_NAMES = {}
+
+@lru_cache(maxsize=128)
+def _mime_for_ext(extension):
+    """Get the MIME type for a lowercase file extension"""
+    return mimetypes.types_map.get(extension) or mimetypes.guess_type('x' + extension)[0] or 'unknown'
+
+def _media_file_info(name, path, size, mtime):
+    """Build the media file info dict from a single size/mtime lookup"""
+    extension = file_extension(name)
+    return {
+        'name': name,
+        'path': path,
+        'size': format_size(size),
+        'size_bytes': size,
+        'modified': datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S'),
+        'type': get_media_type(extension),
+        'mime_type': _mime_for_ext(extension),
+        'extension': extension
+    }
+
+def get_media_files(directory="media/uploads", filter_type=None, exts_whitelist=None):
+    """Get all media files from directory, optionally limited to one type or set of extensions"""
     try:
-        media_files = []
-        directory_path = Path(directory)
-        
-        if not directory_path.exists():
-            return media_files
-        
-        # Supported media extensions
-        media_extensions = {
-            '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v',  # Video
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg',  # Image
-            '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a',  # Audio
-            '.pdf', '.txt', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'  # Document
-        }
-        
-        # Find all files recursively
-        for file_path in directory_path.rglob('*'):
-            if file_path.is_file() and file_path.suffix.lower() in media_extensions:
-                file_info = {
-                    'name': file_path.name,
-                    'path': str(file_path),
-                    'size': format_size(get_file_size(file_path)),
-                    'size_bytes': get_file_size(file_path),
-                    'modified': get_file_date(file_path),
-                    'type': get_media_type(file_path.suffix.lower()),
-                    'mime_type': mimetypes.guess_type(file_path)[0] or 'unknown',
-                    'extension': file_path.suffix.lower()
-                }
-                media_files.append(file_info)
+        # Filter on the extension before any stat or dict construction
+        extensions = MEDIA_EXTENSIONS
+        if filter_type:
+            extensions = TYPE_TO_EXTENSIONS.get(filter_type.lower(), frozenset())
+        if exts_whitelist:
+            extensions = extensions & frozenset(ext.lower() for ext in exts_whitelist)
         
+        media_files = []
+        for entry in iter_media_entries(directory, extensions):
+            try:
+                stat_result = entry.stat()
+            except OSError:
+                # File vanished mid-scan (renamed or deleted elsewhere)
+                continue
+            media_files.append(_media_file_info(entry.name, entry.path, stat_result.st_size, stat_result.st_mtime))
         return media_files
         
     except Exception as e:
         print(f"Error getting media files: {e}")
         return []
 
+def _iter_media_stats(directory="media/uploads", extensions=MEDIA_EXTENSIONS):
+    """Yield (entry, size, mtime) for media files, skipping files that vanish mid-scan"""
+    for entry in iter_media_entries(directory, extensions):
+        try:
+            stat_result = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        yield entry, stat_result.st_size, stat_result.st_mtime
+
 def get_recent_media(limit=10):
     """Get recently added media files"""
     try:
-        media_files = get_media_files()
-        
-        # Sort by modification time (newest first)
-        media_files.sort(key=lambda x: x.get('modified', ''), reverse=True)
+        # Bounded heap over the lazy walk: O(N log k) and only k entries held
+        recent = heapq.nlargest(limit, _iter_media_stats(), key=itemgetter(2))
         
-        return media_files[:limit]
+        return [_media_file_info(entry.name, entry.path, size, mtime) for entry, size, mtime in recent]
         
     except Exception as e:
         print(f"Error getting recent media: {e}")
         return []
 
+def _media_stats(type_counts, total_size_bytes):
+    """Build the media library statistics dict from per-type counts"""
+    return {
+        'total_files': sum(type_counts.values()),
+        'videos': type_counts['video'],
+        'images': type_counts['image'],
+        'audio': type_counts['audio'],
+        'documents': type_counts['document'],
+        'total_size_bytes': total_size_bytes,
+        'total_size_gb': total_size_bytes / (1024**3)
+    }
+
+def scan_stats(root="media/uploads", ext_map=EXT_TO_TYPE):
+    """Count media files per type and sum their sizes under root"""
+    counts = Counter()
+    total_size = 0
+    
+    get_type = ext_map.get
+    
+    if is_network_path(root):
+        # Keep the concurrent walker for high-latency shares
+        for entry, size, _ in _iter_media_stats(root, frozenset(ext_map)):
+            counts[get_type(file_extension(entry.name))] += 1
+            total_size += size
+        return counts, total_size
+    
+    # Walk, classify and sum in one loop with no per-file generator frames
+    pending = [root]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    name = entry.name
+                    dot = name.rfind('.')
+                    if dot <= 0:
+                        continue
+                    file_type = get_type(name[dot:].lower())
+                    if file_type is None or not entry.is_file(follow_symlinks=False):
+                        continue
+                    total_size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
+                counts[file_type] += 1
+    
+    return counts, total_size
+
+def _scan_media_stats(directory="media/uploads"):
+    """Compute media library statistics by walking directory"""
+    return _media_stats(*scan_stats(directory))
+
 def get_media_stats():
     """Get media library statistics"""
     try:
-        media_files = get_media_files()
-        
-        stats = {
-            'total_files': len(media_files),
-            'videos': 0,
-            'images': 0,
-            'audio': 0,
-            'documents': 0,
-            'total_size_bytes': 0,
-            'total_size_gb': 0
-        }
-        
-        for file in media_files:
-            file_type = file.get('type', '').lower()
-            
-            if file_type in ['video', 'videos']:
-                stats['videos'] += 1
-            elif file_type in ['image', 'images']:
-                stats['images'] += 1
-            elif file_type in ['audio']:
-                stats['audio'] += 1
-            elif file_type in ['document', 'documents']:
-                stats['documents'] += 1
-            
-            stats['total_size_bytes'] += file.get('size_bytes', 0)
+        try:
+            ensure_index()
+            rows = get_index_stats()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Media index unavailable, scanning library: {e}")
+            return _scan_media_stats()
         
-        stats['total_size_gb'] = stats['total_size_bytes'] / (1024**3)
-        
-        return stats
+        type_counts = Counter({file_type: count for file_type, count, _ in rows})
+        return _media_stats(type_counts, sum(total_size or 0 for _, _, total_size in rows))
         
     except Exception as e:
         print(f"Error getting media stats: {e}")
-        return {
-            'total_files': 0,
-            'videos': 0,
-            'images': 0,
-            'audio': 0,
-            'documents': 0,
-            'total_size_bytes': 0,
-            'total_size_gb': 0
-        }
-
-def get_media_type(extension):
-    """Get media type from file extension"""
-    video_extensions = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'}
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg'}
-    audio_extensions = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a'}
-    document_extensions = {'.pdf', '.txt', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'}
-    
-    ext = extension.lower()
-    
-    if ext in video_extensions:
-        return 'video'
-    elif ext in image_extensions:
-        return 'image'
-    elif ext in audio_extensions:
-        return 'audio'
-    elif ext in document_extensions:
-        return 'document'
-    else:
-        return 'unknown'
+        return _media_stats(Counter(), 0)
 
 def format_file_size(size_bytes):
     """Format file size in human readable format"""
@@ -163,10 +232,179 @@ def organize_media_file(file_path, organize_by_type=True):
         print(f"Error organizing media file: {e}")
         return False
 
-def generate_thumbnail(video_path, thumbnail_dir="media/thumbnails"):
-    """Generate thumbnail for video file"""
+def _thumbnail_path(video_path, thumbnail_dir="media/thumbnails"):
+    """Get the thumbnail path for a video file"""
+    return Path(thumbnail_dir) / f"{Path(video_path).stem}.jpg"
+
+def _ffprobe_duration_cmd(video_path):
+    """Build the ffprobe command that prints a video's duration in seconds"""
+    return [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'format=duration',
+        '-of', 'default=noprint_wrappers=1:nokey=1',
+        str(video_path)
+    ]
+
+def _parse_duration(output):
+    """Parse ffprobe duration output, returning None if unknown"""
+    try:
+        return float(output.strip())
+    except (TypeError, ValueError):
+        return None
+
+def _probe_duration(video_path):
+    """Get a video's duration in seconds with ffprobe, or None if unknown"""
+    try:
+        probe = subprocess.run(_ffprobe_duration_cmd(video_path), capture_output=True, text=True, timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return _parse_duration(probe.stdout) if probe.returncode == 0 else None
+
+def _ffmpeg_thumbnail_cmd(video_path, thumbnail_path, duration=None):
+    """Build the ffmpeg command that writes a video thumbnail"""
+    # -ss before -i seeks on the input to the nearest keyframe instead of decoding up to it
+    seek = ['-ss', f"{duration * THUMBNAIL_POSITION:.3f}"] if duration else []
+    return [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-hwaccel', 'auto',
+        *seek,
+        '-i', str(video_path),
+        '-vf', "scale='min(320,iw)':-2",
+        '-frames:v', '1',
+        str(thumbnail_path)
+    ]
+
+def _pyav_thumbnail(video_path, thumbnail_path):
+    """Write a thumbnail by decoding a single frame with PyAV"""
+    import av
+    
+    with av.open(str(video_path)) as container:
+        stream = container.streams.video[0]
+        
+        # Seek to the keyframe before the target, then decode just one frame
+        if stream.duration:
+            target = (stream.start_time or 0) + int(stream.duration * THUMBNAIL_POSITION)
+            container.seek(target, stream=stream)
+        elif container.duration:
+            container.seek(int(container.duration * THUMBNAIL_POSITION))
+        
+        frame = next(container.decode(stream), None)
+        if frame is None:
+            return False
+        
+        image = frame.to_image()
+    
+    # Resize frame to thumbnail size
+    if image.width > 320:
+        image = image.resize((320, int(image.height * (320 / image.width))))
+    
+    image.save(str(thumbnail_path), 'JPEG')
+    return True
+
+def _open_video_capture(cv2, video_path):
+    """Open a video with the FFmpeg backend, requesting hardware decoding"""
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        cap = cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG,
+                               [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        if cap.isOpened():
+            return cap
+        cap.release()
+    return cv2.VideoCapture(str(video_path), cv2.CAP_FFMPEG)
+
+def _known_thumbnails(thumbnail_dir="media/thumbnails"):
+    """Get the cached thumbnail name to mtime map for thumbnail_dir, scanning it on first use"""
+    names = _THUMBNAIL_NAMES.get(thumbnail_dir)
+    if names is None:
+        names = {}
+        try:
+            with os.scandir(thumbnail_dir) as entries:
+                for entry in entries:
+                    try:
+                        names[entry.name] = entry.stat().st_mtime_ns
+                    except OSError:
+                        continue
+        except FileNotFoundError:
+            pass
+        _THUMBNAIL_NAMES[thumbnail_dir] = names
+    return names
+
+def _has_current_thumbnail(video_path, thumbnail_path, known):
+    """Check that a thumbnail is cached and not older than its video"""
+    # Thumbnails are keyed by stem, so clip.mov must not reuse the thumbnail of an older clip.mp4
+    thumbnail_mtime = known.get(thumbnail_path.name)
+    if thumbnail_mtime is None:
+        return False
+    try:
+        return os.stat(video_path).st_mtime_ns <= thumbnail_mtime
+    except OSError:
+        return False
+
+def _remember_thumbnail(thumbnail_path, known):
+    """Record a freshly written thumbnail in the cache"""
+    try:
+        known[thumbnail_path.name] = os.stat(thumbnail_path).st_mtime_ns
+    except OSError:
+        known.pop(thumbnail_path.name, None)
+
+def reset_thumbnail_cache():
+    """Forget cached thumbnail names, e.g. after thumbnails are removed externally"""
+    _THUMBNAIL_NAMES.clear()
+
+def _render_thumbnail(video_path, thumbnail_path):
+    """Write a thumbnail using PyAV, OpenCV or the ffmpeg binary, whichever works first"""
+    try:
+        if _pyav_thumbnail(video_path, thumbnail_path):
+            return True
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"PyAV could not read {video_path}, trying OpenCV: {e}")
+    
     try:
         import cv2
+    except ImportError:
+        # Fall back to the ffmpeg binary
+        duration = _probe_duration(video_path)
+        result = subprocess.run(_ffmpeg_thumbnail_cmd(video_path, thumbnail_path, duration),
+                                capture_output=True, timeout=60)
+        return result.returncode == 0
+    
+    # Extract frame from video
+    cap = _open_video_capture(cv2, video_path)
+    
+    # Seek by timestamp, which lands on a keyframe without decoding every frame before it
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    if fps > 0 and frame_count > 0:
+        cap.set(cv2.CAP_PROP_POS_MSEC, frame_count / fps * 1000 * THUMBNAIL_POSITION)
+    
+    # Only convert the frame we keep
+    ret = cap.grab()
+    if ret:
+        ret, frame = cap.retrieve()
+    if ret:
+        # Resize frame to thumbnail size
+        height, width = frame.shape[:2]
+        if width > 320:
+            new_width = 320
+            new_height = int(height * (320 / width))
+            frame = cv2.resize(frame, (new_width, new_height))
+        
+        # Save thumbnail
+        ret = cv2.imwrite(str(thumbnail_path), frame)
+        
+    cap.release()
+    return bool(ret)
+
+def generate_thumbnail(video_path, thumbnail_dir="media/thumbnails", force=False):
+    """Generate thumbnail for video file, skipping videos with an up-to-date one"""
+    try:
+        thumbnail_path = _thumbnail_path(video_path, thumbnail_dir)
+        known = _known_thumbnails(thumbnail_dir)
+        
+        # Compare against the cached thumbnail mtime instead of stat-ing the thumbnail
+        if not force and _has_current_thumbnail(video_path, thumbnail_path, known):
+            return True
         
         video_path_obj = Path(video_path)
         if not video_path_obj.exists():
@@ -176,54 +414,96 @@ def generate_thumbnail(video_path, thumbnail_dir="media/thumbnails"):
         thumbnail_dir_path = Path(thumbnail_dir)
         thumbnail_dir_path.mkdir(parents=True, exist_ok=True)
         
-        # Generate thumbnail filename
-        thumbnail_name = f"{video_path_obj.stem}.jpg"
-        thumbnail_path = thumbnail_dir_path / thumbnail_name
-        
-        # Extract frame from video
-        cap = cv2.VideoCapture(str(video_path))
-        
-        # Get video length and seek to middle
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        middle_frame = frame_count // 2
-        cap.set(cv2.CAP_PROP_POS_FRAMES, middle_frame)
-        
-        ret, frame = cap.read()
-        if ret:
-            # Resize frame to thumbnail size
-            height, width = frame.shape[:2]
-            if width > 320:
-                new_width = 320
-                new_height = int(height * (320 / width))
-                frame = cv2.resize(frame, (new_width, new_height))
-            
-            # Save thumbnail
-            cv2.imwrite(str(thumbnail_path), frame)
-            
-        cap.release()
+        if not _render_thumbnail(video_path, thumbnail_path):
+            return False
+        
+        _remember_thumbnail(thumbnail_path, known)
         return True
         
     except Exception as e:
         print(f"Error generating thumbnail: {e}")
         return False
 
+async def _ffmpeg_thumbnails(video_paths, thumbnail_dir, workers):
+    """Run ffmpeg thumbnail jobs concurrently, at most workers at a time"""
+    semaphore = asyncio.Semaphore(workers)
+    Path(thumbnail_dir).mkdir(parents=True, exist_ok=True)
+    
+    async def run_command(cmd, stdout=asyncio.subprocess.DEVNULL):
+        proc = await asyncio.create_subprocess_exec(*cmd, stdout=stdout, stderr=asyncio.subprocess.DEVNULL)
+        try:
+            out, _ = await asyncio.wait_for(proc.communicate(), 60)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return None, None
+        return proc.returncode, out
+    
+    async def run(video_path):
+        if not os.path.exists(video_path):
+            return False
+        async with semaphore:
+            try:
+                returncode, out = await run_command(_ffprobe_duration_cmd(video_path), asyncio.subprocess.PIPE)
+                duration = _parse_duration(out.decode()) if returncode == 0 else None
+            except OSError:
+                duration = None
+            try:
+                returncode, _ = await run_command(
+                    _ffmpeg_thumbnail_cmd(video_path, _thumbnail_path(video_path, thumbnail_dir), duration)
+                )
+            except OSError as e:
+                print(f"Error generating thumbnail: {e}")
+                return False
+            return returncode == 0
+    
+    return await asyncio.gather(*(run(video_path) for video_path in video_paths))
+
+def generate_thumbnails_bulk(video_paths, thumbnail_dir="media/thumbnails", workers=None, force=False):
+    """Generate thumbnails for many videos in parallel"""
+    video_paths = [str(video_path) for video_path in video_paths]
+    known = _known_thumbnails(thumbnail_dir)
+    
+    results = {}
+    if not force:
+        results = {video_path: True for video_path in video_paths
+                   if _has_current_thumbnail(video_path, _thumbnail_path(video_path, thumbnail_dir), known)}
+    todo = [video_path for video_path in video_paths if video_path not in results]
+    if not todo:
+        return results
+    
+    workers = workers or os.cpu_count() or 1
+    
+    if not (importlib.util.find_spec('av') or importlib.util.find_spec('cv2')):
+        generated = asyncio.run(_ffmpeg_thumbnails(todo, thumbnail_dir, workers))
+    else:
+        try:
+            # Decoding is CPU-bound, so use processes rather than threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_WORKER_CONTEXT) as executor:
+                generated = list(executor.map(partial(generate_thumbnail, thumbnail_dir=thumbnail_dir, force=True),
+                                              todo, chunksize=4))
+        except Exception as e:
+            print(f"Error generating thumbnails in parallel: {e}")
+            generated = [generate_thumbnail(video_path, thumbnail_dir, force=True) for video_path in todo]
+    
+    # Workers have their own caches, so record their results here
+    for video_path, success in zip(todo, generated):
+        results[video_path] = success
+        if success:
+            _remember_thumbnail(_thumbnail_path(video_path, thumbnail_dir), known)
+    
+    return results
+
 def get_media_info(file_path):
     """Get detailed information about media file"""
     try:
-        file_path_obj = Path(file_path)
-        if not file_path_obj.exists():
+        try:
+            stat_result = os.stat(file_path)
+        except FileNotFoundError:
             return None
         
-        info = {
-            'name': file_path_obj.name,
-            'path': str(file_path_obj.absolute()),
-            'size': format_size(get_file_size(file_path)),
-            'size_bytes': get_file_size(file_path),
-            'modified': get_file_date(file_path),
-            'type': get_media_type(file_path_obj.suffix),
-            'mime_type': mimetypes.guess_type(file_path)[0] or 'unknown',
-            'extension': file_path_obj.suffix.lower()
-        }
+        info = _media_file_info(os.path.basename(file_path), os.path.abspath(file_path),
+                                stat_result.st_size, stat_result.st_mtime)
         
         # Additional info for videos
         if info['type'] == 'video':
@@ -262,7 +542,8 @@ def delete_media_file(file_path):
         
         # Delete thumbnail if it exists
         if get_media_type(file_path_obj.suffix) == 'video':
-            thumbnail_path = Path("media/thumbnails") / f"{file_path_obj.stem}.jpg"
+            thumbnail_path = _thumbnail_path(file_path_obj)
+            _known_thumbnails().pop(thumbnail_path.name, None)
             if thumbnail_path.exists():
                 thumbnail_path.unlink()
         
@@ -272,19 +553,50 @@ def delete_media_file(file_path):
         print(f"Error deleting media file: {e}")
         return False
 
+def _name_matcher(queries):
+    """Build a case-insensitive predicate matching names that contain any query"""
+    queries = list(queries)
+    if ahocorasick and len(queries) > 1 and all(queries):
+        # One pass over each name regardless of how many terms there are
+        automaton = ahocorasick.Automaton()
+        for query in queries:
+            automaton.add_word(query.casefold(), query)
+        automaton.make_automaton()
+        return lambda name: next(automaton.iter(name.casefold()), None) is not None
+    
+    # Casefold both sides to match the media index, which folds beyond ASCII
+    search = re.compile('|'.join(re.escape(query.casefold()) for query in queries)).search
+    return lambda name: search(name.casefold()) is not None
+
+def _scan_media_matches(matcher, directory="media/uploads"):
+    """Walk directory and build info dicts only for names accepted by matcher"""
+    matching_files = []
+    for entry, size, mtime in _iter_media_stats(directory):
+        if matcher(entry.name):
+            matching_files.append(_media_file_info(entry.name, entry.path, size, mtime))
+    return matching_files
+
 def search_media(query, directory="media/uploads"):
     """Search media files by name"""
     try:
-        media_files = get_media_files(directory)
-        
-        query_lower = query.lower()
-        matching_files = []
+        try:
+            ensure_index(directory)
+            return [_media_file_info(*row) for row in search_index(query, directory)]
+        except (sqlite3.Error, OSError) as e:
+            print(f"Media index unavailable, scanning library: {e}")
         
-        for file in media_files:
-            if query_lower in file['name'].lower():
-                matching_files.append(file)
+        return _scan_media_matches(_name_matcher([query]), directory)
         
-        return matching_files
+    except Exception as e:
+        print(f"Error searching media: {e}")
+        return []
+
+def search_media_terms(queries, directory="media/uploads"):
+    """Search media files whose name contains any of several terms"""
+    try:
+        if not queries:
+            return []
+        return _scan_media_matches(_name_matcher(queries), directory)
         
     except Exception as e:
         print(f"Error searching media: {e}")
@@ -293,19 +605,41 @@ def search_media(query, directory="media/uploads"):
 def get_media_by_type(media_type, directory="media/uploads"):
     """Get media files filtered by type"""
     try:
-        media_files = get_media_files(directory)
-        
-        filtered_files = []
-        for file in media_files:
-            if file.get('type', '').lower() == media_type.lower():
-                filtered_files.append(file)
-        
-        return filtered_files
+        return get_media_files(directory, filter_type=media_type)
         
     except Exception as e:
         print(f"Error getting media by type: {e}")
         return []
 
+def _json_loads(data):
+    """Parse JSON bytes, using orjson when available"""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def _json_dumps(obj):
+    """Serialize to indented JSON bytes, using orjson when available"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode()
+
+def _read_json_file(path):
+    """Load a JSON file, parsing straight from an mmap when orjson is available"""
+    with open(path, 'rb') as f:
+        # mmap cannot map empty files; those fall through to the parse error below
+        if orjson and os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        return _json_loads(f.read())
+
+def _write_file(path, data):
+    """Write bytes to path with unbuffered os.write calls"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
 def create_media_playlist(files, name="My Playlist"):
     """Create a playlist from media files"""
     try:
@@ -320,8 +654,7 @@ def create_media_playlist(files, name="My Playlist"):
         playlist_dir.mkdir(parents=True, exist_ok=True)
         
         playlist_file = playlist_dir / f"{name.replace(' ', '_')}.json"
-        with open(playlist_file, 'w') as f:
-            json.dump(playlist, f, indent=2)
+        _write_file(playlist_file, _json_dumps(playlist))
         
         return True
         
@@ -332,21 +665,20 @@ def create_media_playlist(files, name="My Playlist"):
 def get_playlists():
     """Get all playlists"""
     try:
-        playlist_dir = Path("data/playlists")
-        if not playlist_dir.exists():
-            return []
-        
         playlists = []
-        for playlist_file in playlist_dir.glob("*.json"):
-            try:
-                with open(playlist_file, 'r') as f:
-                    playlist = json.load(f)
-                    playlists.append(playlist)
-            except:
-                continue
+        with os.scandir("data/playlists") as entries:
+            for entry in entries:
+                if not entry.name.endswith('.json') or not entry.is_file():
+                    continue
+                try:
+                    playlists.append(_read_json_file(entry.path))
+                except (OSError, ValueError):
+                    continue
         
         return playlists
         
+    except FileNotFoundError:
+        return []
     except Exception as e:
         print(f"Error getting playlists: {e}")
-        return []
\ No newline at end of file
+        return []
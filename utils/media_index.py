@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from utils.media_types import file_extension, get_media_type, iter_media_entries
+
+# Metadata index database
+INDEX_FILE = Path("data/media_index.db")
+
+# Bump when the files table changes; older indexes are rebuilt from the filesystem
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    folded TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    mtype TEXT NOT NULL,
+    ext TEXT NOT NULL
+)
+"""
+
+# Roots kept up to date by a filesystem watcher, and those with pending changes
+_WATCHERS = {}
+_DIRTY = set()
+# Per root, (refresh time, directory mtimes) as of its last refresh
+_SIGNATURES = {}
+# Without a watcher, seconds a refresh is trusted while no directory changes.
+# Writes into existing files (e.g. a copy still arriving over Samba) leave
+# directory mtimes alone, so this bounds how stale their sizes can get.
+INDEX_TTL = 5
+_LOCK = threading.Lock()
+
+def _connect():
+    """Open the index database, creating the schema if needed"""
+    INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(INDEX_FILE), timeout=10)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        # The index only caches the filesystem, so rebuild rather than migrate
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS files")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.execute(SCHEMA)
+    return conn
+
+def _root_prefix(root):
+    """Path prefix shared by all indexed entries under root"""
+    return os.path.join(os.path.normpath(root), '')
+
+def _directory_mtimes(root):
+    """Get (path, st_mtime_ns) for root and every directory below it"""
+    mtimes = []
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            mtimes.append((directory, os.stat(directory).st_mtime_ns))
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+        except OSError:
+            continue
+    return tuple(mtimes)
+
+def _directories_unchanged(signature):
+    """Check that no directory in signature gained, lost or renamed an entry"""
+    # An empty signature means root was missing, so it may have appeared since
+    if not signature:
+        return False
+    # Any new subdirectory bumps its parent's mtime, so known directories suffice
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime_ns for path, mtime_ns in signature)
+    except OSError:
+        return False
+
+def refresh_index(root="media/uploads"):
+    """Rescan root and write only added, changed and removed files to the index"""
+    prefix = _root_prefix(root)
+    # Taken before the walk so changes made during it trigger another refresh
+    refreshed_at = time.monotonic()
+    signature = _directory_mtimes(root)
+
+    with closing(_connect()) as conn:
+        known = {
+            path: (size, mtime)
+            for path, size, mtime in conn.execute(
+                "SELECT path, size, mtime FROM files WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix)
+            )
+        }
+
+        changed = []
+        for entry in iter_media_entries(root):
+            path = os.path.join(prefix, os.path.relpath(entry.path, root))
+            try:
+                stat_result = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            size, mtime = stat_result.st_size, stat_result.st_mtime
+
+            if known.pop(path, None) != (size, mtime):
+                ext = file_extension(entry.name)
+                changed.append((path, entry.name, entry.name.casefold(), size, mtime, get_media_type(ext), ext))
+
+        with conn:
+            if changed:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO files (path, name, folded, size, mtime, mtype, ext) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    changed
+                )
+            if known:
+                conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in known])
+
+    with _LOCK:
+        _SIGNATURES[os.path.normpath(root)] = (refreshed_at, signature)
+    return len(changed), len(known)
+
+def ensure_index(root="media/uploads"):
+    """Refresh the index unless a watcher or a recent refresh shows root current"""
+    key = os.path.normpath(root)
+    with _LOCK:
+        dirty = key in _DIRTY
+        if key in _WATCHERS and not dirty:
+            return
+        _DIRTY.discard(key)
+        last = None if dirty else _SIGNATURES.get(key)
+
+    # Back-to-back calls (e.g. one page render) share a refresh; after INDEX_TTL
+    # refresh_index runs again, writing only files whose size or mtime changed
+    if last is not None and time.monotonic() - last[0] < INDEX_TTL and _directories_unchanged(last[1]):
+        return
+    refresh_index(root)
+
+def invalidate_index(root="media/uploads"):
+    """Force the next ensure_index to rescan root, e.g. after files were overwritten in place"""
+    with _LOCK:
+        _DIRTY.add(os.path.normpath(root))
+
+def get_index_stats(root="media/uploads"):
+    """Get (media type, file count, total size) rows for root"""
+    prefix = _root_prefix(root)
+    with closing(_connect()) as conn:
+        return conn.execute(
+            "SELECT mtype, COUNT(*), SUM(size) FROM files WHERE substr(path, 1, ?) = ? GROUP BY mtype",
+            (len(prefix), prefix)
+        ).fetchall()
+
+def search_index(query, root="media/uploads"):
+    """Get (name, path, size, mtime) rows for files under root whose name contains query"""
+    prefix = _root_prefix(root)
+    with closing(_connect()) as conn:
+        # Names are stored casefolded since LIKE only folds ASCII case
+        return conn.execute(
+            "SELECT name, path, size, mtime FROM files "
+            "WHERE substr(path, 1, ?) = ? AND instr(folded, ?) > 0 ORDER BY path",
+            (len(prefix), prefix, query.casefold())
+        ).fetchall()
+
+def start_watcher(root="media/uploads"):
+    """Keep the index for root warm with inotify, if pyinotify is installed"""
+    try:
+        import pyinotify
+    except ImportError:
+        return False
+
+    key = os.path.normpath(root)
+    with _LOCK:
+        if key in _WATCHERS:
+            return True
+
+    class _MarkDirty(pyinotify.ProcessEvent):
+        def process_default(self, event):
+            with _LOCK:
+                _DIRTY.add(key)
+
+    mask = (pyinotify.IN_CREATE | pyinotify.IN_DELETE | pyinotify.IN_MODIFY |
+            pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_FROM | pyinotify.IN_MOVED_TO)
+    manager = pyinotify.WatchManager()
+    manager.add_watch(root, mask, rec=True, auto_add=True)
+    notifier = pyinotify.ThreadedNotifier(manager, _MarkDirty())
+    notifier.daemon = True
+    notifier.start()
+
+    with _LOCK:
+        _WATCHERS[key] = notifier
+        # Changes made before the watch started are not reported
+        _DIRTY.add(key)
+    return True
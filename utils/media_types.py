@@ -0,0 +1,46 @@
+from types import MappingProxyType
+from utils.file_manager import iter_files, iter_files_parallel, is_network_path
+
+# Supported media extensions
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm', '.m4v'})
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.svg'})
+AUDIO_EXTENSIONS = frozenset({'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a'})
+DOCUMENT_EXTENSIONS = frozenset({'.pdf', '.txt', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx'})
+
+# Extension to media type, read-only
+EXT_TO_TYPE = MappingProxyType({
+    **dict.fromkeys(VIDEO_EXTENSIONS, 'video'),
+    **dict.fromkeys(IMAGE_EXTENSIONS, 'image'),
+    **dict.fromkeys(AUDIO_EXTENSIONS, 'audio'),
+    **dict.fromkeys(DOCUMENT_EXTENSIONS, 'document'),
+})
+
+MEDIA_EXTENSIONS = frozenset(EXT_TO_TYPE)
+
+# Media type to its extensions
+TYPE_TO_EXTENSIONS = MappingProxyType({
+    'video': VIDEO_EXTENSIONS,
+    'image': IMAGE_EXTENSIONS,
+    'audio': AUDIO_EXTENSIONS,
+    'document': DOCUMENT_EXTENSIONS,
+})
+
+def file_extension(name):
+    """Get the lowercase extension of a file name, or '' if it has none"""
+    # Plain string slicing; cheaper than os.path.splitext or Path.suffix in hot loops
+    dot = name.rfind('.')
+    return name[dot:].lower() if dot > 0 else ''
+
+def get_media_type(extension):
+    """Get media type from file extension"""
+    return EXT_TO_TYPE.get(extension.lower(), 'unknown')
+
+def iter_media_entries(directory="media/uploads", extensions=MEDIA_EXTENSIONS):
+    """Yield DirEntry objects for all media files under directory"""
+    # Network shares have high per-request latency, so scan their directories concurrently
+    walker = iter_files_parallel if is_network_path(directory) else iter_files
+    for entry in walker(directory):
+        name = entry.name
+        dot = name.rfind('.')
+        if dot > 0 and name[dot:].lower() in extensions:
+            yield entry
@@ -1,20 +1,77 @@
+import asyncio
 import json
 import os
+import shutil
+import struct
 import subprocess
 from pathlib import Path
 import socket
 import ipaddress
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+try:
+    from smbprotocol.connection import Connection as SMBConnection
+    from smbprotocol.session import Session as SMBSession
+    from smbprotocol.tree import TreeConnect as SMBTreeConnect
+except ImportError:
+    SMBConnection = None
+
+from utils.file_manager import fast_copy, get_mounts, iter_files, iter_files_parallel
 
 # Configuration file
 CONFIG_FILE = Path("config/storage_config.json")
+# Last parsed config, valid while the file's (st_mtime_ns, st_size) is unchanged
+_CONFIG_CACHE = {'signature': None, 'data': None}
+
+# Filesystem types listed as network shares
+NETWORK_SHARE_TYPES = frozenset({'cifs', 'smb3', 'smbfs', 'nfs', 'nfs4'})
+
+# is_mount_point answers, valid while get_mounts returns the same table
+_MOUNT_POINT_CACHE = {'mounts': None, 'results': {}}
+
+# Root runs mount/umount directly. Otherwise sudo is needed even with CAP_SYS_ADMIN,
+# because mount.cifs rejects non-zero uids. -n fails fast instead of prompting.
+# os.geteuid is POSIX-only; elsewhere there is no sudo or cifs mount to wrap.
+_geteuid = getattr(os, 'geteuid', None)
+_MOUNT_PREFIX = ['sudo', '-n'] if _geteuid and _geteuid() != 0 else []
+_PRESERVE_ENV = ['-E'] if _MOUNT_PREFIX else []
+
+# Ports smbclient can reach a server on, and the time allowed to connect to them
+SMB_PORTS = (445, 139)
+SMB_CONNECT_TIMEOUT = 1.5
+
+# Storage statistics per mount point as (time, stats), reused for STATS_TTL seconds
+STATS_TTL = 30
+_STATS_CACHE = {}
+
+# Concurrent file copies when syncing to a share without rsync
+SYNC_WORKERS = 8
+
+# Concurrent host probes during a network scan, and the delay between starting them
+SCAN_WORKERS = 128
+SCAN_STAGGER = 0.005
+# Timeout for each liveness probe of a host
+PROBE_TIMEOUT = 0.3
+# Concurrent reverse DNS lookups for live hosts
+RESOLVE_WORKERS = 32
 
 def get_network_storage_config():
     """Load network storage configuration"""
     try:
-        if CONFIG_FILE.exists():
+        try:
+            st = os.stat(CONFIG_FILE)
+        except FileNotFoundError:
+            return {}
+        
+        signature = (st.st_mtime_ns, st.st_size)
+        if _CONFIG_CACHE['signature'] != signature:
             with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+                _CONFIG_CACHE['data'] = json.load(f)
+            _CONFIG_CACHE['signature'] = signature
+        # Copy so callers cannot modify the cached config
+        return dict(_CONFIG_CACHE['data'])
     except Exception as e:
         print(f"Error loading network storage config: {e}")
         return {}
@@ -23,6 +80,7 @@ def save_network_storage_config(config):
     """Save network storage configuration"""
     try:
         CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+        _CONFIG_CACHE['signature'] = None
         with open(CONFIG_FILE, 'w') as f:
             json.dump(config, f, indent=2)
         return True
@@ -30,34 +88,104 @@ def save_network_storage_config(config):
         print(f"Error saving network storage config: {e}")
         return False
 
-def test_smb_connection(server_ip, share_name, username, password):
+async def _run_command(cmd, timeout, env=None):
+    """Run cmd without blocking the event loop, returning (returncode, stdout, stderr)"""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=env
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout) from None
+    return proc.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace')
+
+def _smb_tree_connect(server_ip, share_name, username, password):
+    """Negotiate, authenticate and connect to share over one SMB2 connection"""
+    connection = SMBConnection(uuid.uuid4(), server_ip, 445)
+    connection.connect(timeout=5)
+    try:
+        session = SMBSession(connection, username, password, require_encryption=False)
+        session.connect()
+        tree = SMBTreeConnect(session, f"\\\\{server_ip}\\{share_name}")
+        tree.connect()
+        tree.disconnect()
+    finally:
+        connection.disconnect()
+
+async def _any_port_open(ip, ports, timeout):
+    """Check whether any of ports accepts a connection, returning as soon as one does"""
+    pending = {asyncio.ensure_future(_tcp_probe(ip, port, timeout)) for port in ports}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if any(task.result() == 'open' for task in done):
+                return True
+        return False
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def test_smb_connection_async(server_ip, share_name, username, password):
     """Test SMB/CIFS connection"""
     try:
-        # Test basic connectivity
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(5)
-        result = sock.connect_ex((server_ip, 445))
-        sock.close()
+        # Speak SMB2 directly when smbprotocol is installed, instead of forking smbclient
+        if SMBConnection is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, partial(_smb_tree_connect, server_ip, share_name, username, password)
+            )
+            return {'success': True, 'shares': share_name}
         
-        if result != 0:
-            return {'success': False, 'error': f'Cannot connect to {server_ip}:445'}
+        # Test basic connectivity on direct SMB and NetBIOS session ports at once
+        if not await _any_port_open(server_ip, SMB_PORTS, SMB_CONNECT_TIMEOUT):
+            return {'success': False, 'error': f'Cannot connect to {server_ip} on ports 445 or 139'}
         
         # Test SMB connection with smbclient
         cmd = ['smbclient', '-L', f'//{server_ip}', '-U', username, '-N'] if not password else [
             'smbclient', '-L', f'//{server_ip}', '-U', f'{username}%{password}'
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        returncode, stdout, stderr = await _run_command(cmd, timeout=10)
         
-        if result.returncode == 0:
-            return {'success': True, 'shares': result.stdout}
+        if returncode == 0:
+            return {'success': True, 'shares': stdout}
         else:
-            return {'success': False, 'error': result.stderr or 'Connection failed'}
+            return {'success': False, 'error': stderr or 'Connection failed'}
             
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def mount_smb_share(server_ip, share_name, username, password, mount_point):
+def test_smb_connection(server_ip, share_name, username, password):
+    """Test SMB/CIFS connection"""
+    return asyncio.run(test_smb_connection_async(server_ip, share_name, username, password))
+
+async def _mount_with_credentials_file(source, mount_path, options, username, password):
+    """Mount a CIFS share passing credentials through a temporary file"""
+    # Create credentials file
+    creds_file = Path("/tmp/smb_creds")
+    with open(creds_file, 'w') as f:
+        f.write(f"username={username}\n")
+        f.write(f"password={password}\n")
+    
+    os.chmod(creds_file, 0o600)
+    
+    cmd = [
+        *_MOUNT_PREFIX, 'mount', '-t', 'cifs', source, str(mount_path),
+        '-o', f'credentials={creds_file},{options}'
+    ]
+    
+    try:
+        return await _run_command(cmd, timeout=30)
+    finally:
+        # Clean up credentials file
+        creds_file.unlink(missing_ok=True)
+
+async def mount_smb_share_async(server_ip, share_name, username, password, mount_point):
     """Mount SMB/CIFS share"""
     try:
         # Create mount point directory
@@ -68,163 +196,244 @@ def mount_smb_share(server_ip, share_name, username, password, mount_point):
         if is_mount_point(mount_point):
             return {'success': True, 'message': 'Already mounted'}
         
-        # Create credentials file
-        creds_file = Path("/tmp/smb_creds")
-        with open(creds_file, 'w') as f:
-            f.write(f"username={username}\n")
-            f.write(f"password={password}\n")
-        
-        os.chmod(creds_file, 0o600)
-        
-        # Mount command
-        cmd = [
-            'sudo', 'mount', '-t', 'cifs',
-            f'//{server_ip}/{share_name}',
-            str(mount_path),
-            '-o', f'credentials={creds_file},uid={os.getuid()},gid={os.getgid()},iocharset=utf8'
-        ]
+        source = f'//{server_ip}/{share_name}'
+        options = f'uid={os.getuid()},gid={os.getgid()},iocharset=utf8'
         
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        returncode = None
+        if ',' not in username:
+            # The username is not secret and goes in the options (sudo resets USER);
+            # mount.cifs reads the password from PASSWD, so no credentials file is written
+            env = {**os.environ, 'PASSWD': password or ''}
+            cmd = [
+                *_MOUNT_PREFIX, *_PRESERVE_ENV, 'mount', '-t', 'cifs', source, str(mount_path),
+                '-o', f'username={username},{options}'
+            ]
+            returncode, stdout, stderr = await _run_command(cmd, timeout=30, env=env)
         
-        # Clean up credentials file
-        creds_file.unlink(missing_ok=True)
+        # A comma in the username would split the option list, and sudoers may refuse
+        # to preserve the environment; a credentials file handles both
+        if returncode is None or (returncode != 0 and stderr.startswith('sudo:')):
+            returncode, stdout, stderr = await _mount_with_credentials_file(
+                source, mount_path, options, username, password
+            )
         
-        if result.returncode == 0:
+        if returncode == 0:
+            _STATS_CACHE.clear()
             return {'success': True, 'mount_point': str(mount_path)}
         else:
-            return {'success': False, 'error': result.stderr or result.stdout}
+            return {'success': False, 'error': stderr or stdout}
             
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
-def unmount_smb_share(mount_point):
+def mount_smb_share(server_ip, share_name, username, password, mount_point):
+    """Mount SMB/CIFS share"""
+    return asyncio.run(mount_smb_share_async(server_ip, share_name, username, password, mount_point))
+
+async def unmount_smb_share_async(mount_point):
     """Unmount SMB/CIFS share"""
     try:
         if not is_mount_point(mount_point):
             return {'success': True, 'message': 'Not mounted'}
         
-        cmd = ['sudo', 'umount', mount_point]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+        cmd = [*_MOUNT_PREFIX, 'umount', mount_point]
+        returncode, stdout, stderr = await _run_command(cmd, timeout=10)
         
-        if result.returncode == 0:
+        if returncode == 0:
+            _STATS_CACHE.clear()
             return {'success': True, 'message': 'Unmounted successfully'}
         else:
-            return {'success': False, 'error': result.stderr or result.stdout}
+            return {'success': False, 'error': stderr or stdout}
             
     except Exception as e:
         return {'success': False, 'error': str(e)}
 
+def unmount_smb_share(mount_point):
+    """Unmount SMB/CIFS share"""
+    return asyncio.run(unmount_smb_share_async(mount_point))
+
 def is_mount_point(path):
     """Check if path is a mount point"""
-    try:
-        # Check if path exists and is a directory
-        if not os.path.exists(path) or not os.path.isdir(path):
-            return False
-        
-        # Check if it's a mount point using mountpoint command
-        result = subprocess.run(['mountpoint', '-q', path], capture_output=True)
-        return result.returncode == 0
+    mounts = get_mounts()
+    if _MOUNT_POINT_CACHE['mounts'] is not mounts:
+        # Mount table was reparsed, so earlier answers may be stale
+        _MOUNT_POINT_CACHE['mounts'] = mounts
+        _MOUNT_POINT_CACHE['results'] = {}
+    
+    results = _MOUNT_POINT_CACHE['results']
+    if path not in results:
+        results[path] = os.path.ismount(path)
+    return results[path]
+
+def _storage_stats(mount_point):
+    """Get usage statistics for mount_point, cached for STATS_TTL seconds"""
+    now = time.monotonic()
+    cached = _STATS_CACHE.get(mount_point)
+    if cached is None or now - cached[0] >= STATS_TTL:
+        # statvfs is a server round trip on network mounts
+        statvfs = os.statvfs(mount_point)
+        total_bytes = statvfs.f_blocks * statvfs.f_frsize
+        free_bytes = statvfs.f_bavail * statvfs.f_frsize
+        used_bytes = total_bytes - free_bytes
         
-    except Exception:
-        return False
+        cached = (now, {
+            'total_gb': total_bytes / (1024**3),
+            'used_gb': used_bytes / (1024**3),
+            'free_gb': free_bytes / (1024**3),
+            'usage_percent': (used_bytes / total_bytes) * 100 if total_bytes > 0 else 0
+        })
+        _STATS_CACHE[mount_point] = cached
+    # Copy so callers cannot modify the cached stats
+    return dict(cached[1])
 
 def get_mounted_shares():
     """Get list of mounted network shares"""
+    mounted_shares = []
+    
     try:
-        mounted_shares = []
-        
-        # Get mount information
-        result = subprocess.run(['mount'], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                if 'type cifs' in line:
-                    parts = line.split()
-                    if len(parts) >= 6:
-                        device = parts[0]
-                        mount_point = parts[2]
-                        fs_type = parts[4]
-                        options = parts[5].strip('()')
-                        
-                        share_info = {
-                            'device': device,
-                            'mount_point': mount_point,
-                            'type': fs_type,
-                            'options': options
-                        }
-                        
-                        # Get storage statistics
-                        try:
-                            statvfs = os.statvfs(mount_point)
-                            total_bytes = statvfs.f_blocks * statvfs.f_frsize
-                            free_bytes = statvfs.f_bavail * statvfs.f_frsize
-                            used_bytes = total_bytes - free_bytes
-                            
-                            share_info['stats'] = {
-                                'total_gb': total_bytes / (1024**3),
-                                'used_gb': used_bytes / (1024**3),
-                                'free_gb': free_bytes / (1024**3),
-                                'usage_percent': (used_bytes / total_bytes) * 100 if total_bytes > 0 else 0
-                            }
-                        except:
-                            pass
-                        
-                        mounted_shares.append(share_info)
+        for mount in get_mounts():
+            if mount['type'] not in NETWORK_SHARE_TYPES:
+                continue
+            
+            share_info = dict(mount)
+            mount_point = mount['mount_point']
+            
+            # Get storage statistics
+            try:
+                share_info['stats'] = _storage_stats(mount_point)
+            except OSError:
+                pass
+            
+            mounted_shares.append(share_info)
     
     except Exception as e:
         print(f"Error getting mounted shares: {e}")
     
     return mounted_shares
 
-def scan_network_devices(network_range="192.168.1.0/24"):
+async def _tcp_probe(ip, port, timeout=PROBE_TIMEOUT):
+    """Connect to ip:port, returning 'open', 'closed' (host answered with a reset) or None"""
+    loop = asyncio.get_running_loop()
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    except OSError:
+        return None
+    with sock:
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        except ConnectionRefusedError:
+            return 'closed'
+        except (OSError, asyncio.TimeoutError):
+            return None
+        return 'open'
+
+async def _datagram_exchange(sock, packet, address, bufsize, timeout):
+    """Send one datagram and wait for a reply, returning it or None"""
+    loop = asyncio.get_running_loop()
+    sock.setblocking(False)
+    try:
+        sock.sendto(packet, address)
+        return await asyncio.wait_for(loop.sock_recv(sock, bufsize), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+def _icmp_checksum(data):
+    """Internet checksum of an ICMP message"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+async def _icmp_echo(ip, timeout=PROBE_TIMEOUT):
+    """Send an ICMP echo over an unprivileged ping socket; None if those are not permitted"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except OSError:
+        return None
+    with sock:
+        header = struct.pack('!BBHHH', 8, 0, 0, 0, 1)
+        packet = struct.pack('!BBHHH', 8, 0, _icmp_checksum(header), 0, 1)
+        reply = await _datagram_exchange(sock, packet, (ip, 0), 64, timeout)
+        return bool(reply) and reply[0] == 0
+
+# NetBIOS node status query for the wildcard name
+_NBSTAT_QUERY = (b'\x13\x37\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+                 b'\x20CK' + b'A' * 30 + b'\x00\x00\x21\x00\x01')
+
+async def _netbios_probe(ip, timeout=PROBE_TIMEOUT):
+    """Check whether a host answers a NetBIOS node status query on UDP 137"""
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    except OSError:
+        return False
+    with sock:
+        return bool(await _datagram_exchange(sock, _NBSTAT_QUERY, (ip, 137), 1024, timeout))
+
+async def _probe_host(ip, limit, delay):
+    """Probe a single host, returning its device info or None if it is down"""
+    # Stagger start times so ICMP bursts are not dropped by the kernel
+    await asyncio.sleep(delay)
+    async with limit:
+        try:
+            # The SMB port doubles as the liveness test: a reset also means the host is up
+            smb_state = await _tcp_probe(ip, 445)
+            if smb_state is None:
+                alive = await _icmp_echo(ip)
+                if alive is None:
+                    alive = await _netbios_probe(ip)
+                if not alive:
+                    return None
+            
+            return {'ip': ip, 'smb_available': smb_state == 'open'}
+            
+        except Exception:
+            return None
+
+def _reverse_lookup(ip):
+    """Get the hostname for ip, or 'Unknown' if it has none"""
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except OSError:
+        return 'Unknown'
+
+async def scan_network_devices_async(network_range="192.168.1.0/24", max_workers=SCAN_WORKERS):
     """Scan network for devices"""
     devices = []
     
     try:
         # Extract network and host parts
         network = ipaddress.ip_network(network_range, strict=False)
+        ips = [str(ip) for ip in network.hosts()]
         
-        for ip in network.hosts():
-            try:
-                # Quick ping test
-                result = subprocess.run(
-                    ['ping', '-c', '1', '-W', '1', str(ip)],
-                    capture_output=True,
-                    timeout=2
-                )
-                
-                if result.returncode == 0:
-                    device = {'ip': str(ip)}
-                    
-                    # Try to get hostname
-                    try:
-                        hostname = socket.gethostbyaddr(str(ip))[0]
-                        device['hostname'] = hostname
-                    except:
-                        device['hostname'] = 'Unknown'
-                    
-                    # Check if SMB service is available
-                    try:
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(1)
-                        result = sock.connect_ex((str(ip), 445))
-                        sock.close()
-                        device['smb_available'] = result == 0
-                    except:
-                        device['smb_available'] = False
-                    
-                    devices.append(device)
-                    
-            except subprocess.TimeoutExpired:
-                continue
-            except Exception:
-                continue
+        # One thread multiplexes all probes; the semaphore caps open sockets
+        limit = asyncio.Semaphore(max_workers)
+        results = await asyncio.gather(*(
+            _probe_host(ip, limit, index * SCAN_STAGGER) for index, ip in enumerate(ips)
+        ))
+        devices = [device for device in results if device]
+        
+        # Resolve names only for live hosts; dead addresses are where PTR timeouts pile up
+        if devices:
+            loop = asyncio.get_running_loop()
+            with ThreadPoolExecutor(max_workers=min(RESOLVE_WORKERS, len(devices))) as executor:
+                hostnames = await asyncio.gather(*(
+                    loop.run_in_executor(executor, _reverse_lookup, device['ip']) for device in devices
+                ))
+            for device, hostname in zip(devices, hostnames):
+                device['hostname'] = hostname
     
     except Exception as e:
         print(f"Error scanning network: {e}")
     
     return devices
 
+def scan_network_devices(network_range="192.168.1.0/24", max_workers=SCAN_WORKERS):
+    """Scan network for devices"""
+    return asyncio.run(scan_network_devices_async(network_range, max_workers))
+
 def check_network_storage():
     """Check network storage connection status"""
     try:
@@ -239,19 +448,7 @@ def check_network_storage():
             
             # Get basic stats
             try:
-                statvfs = os.statvfs(mount_point)
-                total_bytes = statvfs.f_blocks * statvfs.f_frsize
-                free_bytes = statvfs.f_bavail * statvfs.f_frsize
-                used_bytes = total_bytes - free_bytes
-                
-                stats = {
-                    'total_gb': total_bytes / (1024**3),
-                    'used_gb': used_bytes / (1024**3),
-                    'free_gb': free_bytes / (1024**3),
-                    'usage_percent': (used_bytes / total_bytes) * 100 if total_bytes > 0 else 0
-                }
-                
-                return {'connected': True, 'stats': stats}
+                return {'connected': True, 'stats': _storage_stats(mount_point)}
             
             except Exception as e:
                 return {'connected': True, 'error': f'Cannot get storage stats: {e}'}
@@ -270,17 +467,7 @@ def get_storage_stats():
         return None
     
     try:
-        statvfs = os.statvfs(mount_point)
-        total_bytes = statvfs.f_blocks * statvfs.f_frsize
-        free_bytes = statvfs.f_bavail * statvfs.f_frsize
-        used_bytes = total_bytes - free_bytes
-        
-        return {
-            'total_gb': total_bytes / (1024**3),
-            'used_gb': used_bytes / (1024**3),
-            'free_gb': free_bytes / (1024**3),
-            'usage_percent': (used_bytes / total_bytes) * 100 if total_bytes > 0 else 0
-        }
+        return _storage_stats(mount_point)
     
     except Exception as e:
         print(f"Error getting storage stats: {e}")
@@ -290,27 +477,50 @@ def auto_mount_network_storage():
     """Auto-mount network storage on startup"""
     config = get_network_storage_config()
     
-    if not config.get('auto_mount', False) or not config.get('enabled', False):
-        return False
-    
-    server_ip = config.get('server_ip')
-    share_name = config.get('share_name')
-    username = config.get('username')
-    mount_point = config.get('mount_point')
-    
-    if not all([server_ip, share_name, username, mount_point]):
+    # Cheapest checks first: plain lookups short-circuit before any filesystem access
+    if not (config.get('auto_mount') and config.get('enabled') and config.get('server_ip')
+            and config.get('share_name') and config.get('username') and config.get('mount_point')):
         return False
     
     # Check if already mounted
-    if is_mount_point(mount_point):
+    if is_mount_point(config['mount_point']):
         return True
     
     # Try to mount
     password = os.getenv('SMB_PASSWORD', '')  # Get password from environment
-    result = mount_smb_share(server_ip, share_name, username, password, mount_point)
+    result = mount_smb_share(
+        config['server_ip'], config['share_name'], config['username'], password, config['mount_point']
+    )
     
     return result.get('success', False)
 
+def _rsync_tree(source, destination):
+    """Copy newer files from source to destination with rsync, returning an error or None"""
+    result = subprocess.run(
+        ['rsync', '-a', '--update', f"{source}/", f"{destination}/"],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return result.stderr.strip() or f"rsync exited with status {result.returncode}"
+    return None
+
+def _tree_mtimes(root):
+    """Map relative path to mtime for every regular file under root"""
+    # The share is remote, so list its directories concurrently
+    mtimes = {}
+    for entry in iter_files_parallel(str(root)):
+        try:
+            mtimes[os.path.relpath(entry.path, root)] = entry.stat(follow_symlinks=False).st_mtime
+        except OSError:
+            continue
+    return mtimes
+
+def _copy_to_share(source, target):
+    """Copy one file to the share, creating its parent directories"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fast_copy(source, target)
+
 def sync_media_to_network_storage():
     """Sync local media to network storage"""
     config = get_network_storage_config()
@@ -320,8 +530,6 @@ def sync_media_to_network_storage():
         return {'success': False, 'error': 'Network storage not mounted'}
     
     try:
-        import shutil
-        
         local_media = Path("media/uploads")
         network_media = Path(mount_point) / "media"
         
@@ -329,22 +537,46 @@ def sync_media_to_network_storage():
             # Create network media directory
             network_media.mkdir(parents=True, exist_ok=True)
             
-            # Copy files
-            for file_path in local_media.rglob('*'):
-                if file_path.is_file():
-                    relative_path = file_path.relative_to(local_media)
-                    target_path = network_media / relative_path
-                    
-                    # Create parent directories
-                    target_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Copy file if it doesn't exist or is newer
-                    if not target_path.exists() or file_path.stat().st_mtime > target_path.stat().st_mtime:
-                        shutil.copy2(file_path, target_path)
+            # rsync walks and pipelines the whole tree in one process
+            if shutil.which('rsync'):
+                error = _rsync_tree(local_media, network_media)
+                if error:
+                    return {'success': False, 'error': error}
+                return {'success': True}
             
+            # List the share once instead of stat-ing each target over the network
+            target_mtimes = _tree_mtimes(network_media)
+            
+            # Collect files that don't exist on the share or are newer locally
+            to_copy = []
+            for entry in iter_files(str(local_media)):
+                relative_path = os.path.relpath(entry.path, local_media)
+                target_mtime = target_mtimes.get(relative_path)
+                if target_mtime is None or entry.stat(follow_symlinks=False).st_mtime > target_mtime:
+                    to_copy.append((entry.path, network_media / relative_path))
+            
+            # Keep several SMB writes in flight; one failed file doesn't stop the rest
+            errors = []
+            with ThreadPoolExecutor(max_workers=SYNC_WORKERS) as executor:
+                futures = {
+                    executor.submit(_copy_to_share, source, target): source
+                    for source, target in to_copy
+                }
+                for future, source in futures.items():
+                    try:
+                        future.result()
+                    except OSError as e:
+                        errors.append(f"{source}: {e}")
+            
+            if errors:
+                return {
+                    'success': False,
+                    'error': f"{len(errors)} of {len(to_copy)} files failed to copy: {errors[0]}",
+                    'failed': errors
+                }
             return {'success': True}
         else:
             return {'success': False, 'error': 'No local media found'}
     
     except Exception as e:
-        return {'success': False, 'error': str(e)}
\ No newline at end of file
+        return {'success': False, 'error': str(e)}